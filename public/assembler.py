@@ -9,10 +9,35 @@ import re
 # python3 -m pdoc assembler.py -o=docs 
 import sys, argparse
 from enum import Enum
+from functools import lru_cache
+from types import MappingProxyType
 import pseudoinstruction_handler as ph
 
+#strips leading whitespace, splits out an optional label, and drops any
+#trailing comment in a single C-level pass over the line
+_LINE_RE = re.compile(r"^\s*(?:([A-Za-z_]\w*)\s*:)?\s*([^;]*?)\s*(?:;.*)?$")
+
+#splits an instruction into tokens on any run of spaces, tabs, and commas
+_TOKEN_RE = re.compile(r"[ \t,]+")
+
+#address of the first instruction in the text segment of memory
+TEXT_BASE = 0x00400000
+
+#matches a base-offset operand like `4(t1)`, `-8 (sp)`, etc.
+_BASE_OFFSET_RE = re.compile(r"\s*(-?\d+)\s*\(\s*(\w+)\s*\)\s*")
+
 def main(args):
-    assemble_asm(args.asm.readlines(), args)
+    #open with a large buffer so big source files cost few read syscalls;
+    #argparse hands us plain paths so nothing is opened before it is needed
+    with open(args.asm, "r", buffering=1<<20) as asm:
+        asm_lines = asm.readlines()
+
+    if(args.out):
+        with open(args.out, "w", buffering=1<<20) as out:
+            args.out = out
+            assemble_asm(asm_lines, args)
+    else:
+        assemble_asm(asm_lines, args)
 
 
 def assemble_asm(asm_lines, args = None):
@@ -21,18 +46,32 @@ def assemble_asm(asm_lines, args = None):
     Removes comments and blanks and assembles the entire code, returning a list 
     containing binary strings of machine code."""
 
-    #clean up the code removing comments and blanks
-    print("Cleaning comments...")
-    asm_list = comments_pass(asm_lines)
-
-    #process the pseudoinstruction defninition
-    print("Processing pseudoinstructions...")
+    #one fused pass over the source: strip comments, expand
+    #pseudoinstructions, and collect labels, without materializing a
+    #separate intermediate list for each stage
+    print("Cleaning, expanding, and labelling...")
     pseudos = ph.get_pseudoinstruction_defs()
-    core_asm = pseudoinstruction_pass(asm_list, pseudos)
+    clean_code = []
+    labels = {}
 
-    #extract the labels
-    print("Creating labels...")
-    clean_code, labels = parse_labels(core_asm)
+    for line in asm_lines:
+        m = _LINE_RE.match(line)
+        if(m == None):
+            continue
+        label, instr = m.group(1), m.group(2)
+        if(label != None):
+            if(label in labels):
+                raise BadLabel()
+            #map the label to the index of the next emitted instruction
+            labels[label] = len(clean_code)
+        if(not instr):
+            continue
+        command = instr.split(None, 1)[0]
+        expander = pseudos.get(command)
+        if(expander == None):
+            clean_code.append(instr)
+        else:
+            clean_code.extend(expander(instr, len(clean_code)))
 
     #assemble each line
     print("Translating to machine code...")
@@ -62,13 +101,12 @@ def assemble_asm(asm_lines, args = None):
 def comments_pass(asm_lines):
     """Takes in a list representing the contents of an asm file.
         Returns a new list with comments and blank lines removed from the list."""
-    asm_list = []
-    for line in asm_lines:
-        line = remove_comments(line.lstrip())
-        if(line == None):
-            continue
-        asm_list.append(line)
-    return asm_list
+    #single comprehension: one regex match per line and no helper-call
+    #frame, with blank/comment-only lines filtered out as we go
+    return [(lc[0] + ": " + lc[1] if lc[1] else lc[0] + ":") if lc[0] != None else lc[1]
+            for line in asm_lines
+            if (m := _LINE_RE.match(line)) != None
+            and ((lc := m.group(1, 2))[0] != None or lc[1])]
 
 def pseudoinstruction_pass(asm_lines, pseudos_dictionary):
     """Takes in a list of assembly instructions (with no comments, labels are okay) 
@@ -77,24 +115,20 @@ def pseudoinstruction_pass(asm_lines, pseudos_dictionary):
     
     newLines = []
 
-
-    for i in range(len(asm_lines)):
-        line = asm_lines[i]  # Get the current line
+    for i, line in enumerate(asm_lines):
         label, instr = split_out_label(line)
-        command = instr.split()[0]  # Extract the command (e.g., "diffsums")
-
-        if(has_label(line)):
-            command = instr.split()[0]
-
+        if(instr == None):
+            #label-only line, nothing to expand
+            newLines.append(line)
+            continue
 
-        if command in pseudos_dictionary:
-            # Expand pseudo-instruction
-           
-            expanded_lines = pseudos_dictionary[command](instr, i)
-            # Append expanded lines to newLines
-            newLines.extend(expanded_lines)
-        else:
+        command = instr.split(None, 1)[0]  # Extract the command (e.g., "diffsums")
+        expander = pseudos_dictionary.get(command)
+        if(expander == None):
             newLines.append(line)
+        else:
+            # Expand pseudo-instruction
+            newLines.extend(expander(instr, i))
 
     return newLines
 
@@ -103,11 +137,266 @@ def machine_pass(asm_lines, labels_dictionary):
         Returns a list containing the binary machine translation of each line."""
     machine_code = []
     for i, line in enumerate(asm_lines):
-        result = Assemble(line, i, labels_dictionary)
-        machine_code.append(result)
+        cmd, args = _tokenize(line)
+        machine_code.append(_assemble_tokens(cmd, args, i, labels_dictionary))
 
     return machine_code
 
+##############
+#
+# Utilities 
+#
+##############
+
+#Enum of Types
+Types = Enum("Types", ["R", "I", "S", "SB", "U", "UJ", "PSEUDO"])
+"""Enum of instruction Types"""
+
+#dictionary mapping instruction name to types
+inst_to_types = {#R types
+                "add":Types.R, "sub":Types.R, "xor":Types.R, "or":Types.R, "and":Types.R, "sll":Types.R,
+                "srl":Types.R, "sra":Types.R, "slt":Types.R, 
+                #I Types and S Types
+                "addi":Types.I, "xori":Types.I, "ori":Types.I, "andi":Types.I, "slli":Types.I, "srli":Types.I,
+                "srai":Types.I, "lw":Types.I, "sw":Types.S, "jalr":Types.I,
+                #SB Types
+                "beq":Types.SB, "bne":Types.SB, "blt":Types.SB, "bge":Types.SB, 
+                #U and UJ Types
+                "jal":Types.UJ, "lui":Types.U
+                }
+"""Dictionary mapping instruction name to types"""
+
+#intern the mnemonic keys so probes against tokens interned in _tokenize
+#resolve with pointer comparisons
+inst_to_types = {sys.intern(k): v for k, v in inst_to_types.items()}
+
+
+
+class FieldData():
+    """
+    Struct to hold data for different fields of instructions.
+    """
+    __slots__ = ("opcode", "func3", "func7",
+                 "opcode_i", "func3_i", "func7_i",
+                 "r_partial", "i_partial", "u_partial")
+
+    def __init__(self, opcode, func3=None, func7=None):
+        self.opcode = opcode
+        self.func7 = func7
+        self.func3 = func3
+        #integer forms cached once so the encoders can OR fields together
+        #without re-parsing the binary strings on every instruction
+        self.opcode_i = int(opcode, 2)
+        self.func3_i = int(func3, 2) if func3 else 0
+        self.func7_i = int(func7, 2) if func7 else 0
+        #the constant part of the word is the same for every use of a
+        #mnemonic, so pre-assemble it per format once at import time
+        self.r_partial = (self.func7_i << 25) | (self.func3_i << 12) | self.opcode_i
+        self.i_partial = (self.func3_i << 12) | self.opcode_i
+        self.u_partial = self.opcode_i
+        
+
+#dictionay mapping instruction name to the different fields as a FieldData object
+inst_to_fields = {#R types
+                "add":FieldData("0110011", "000", "0000000"), 
+                "sub":FieldData("0110011", "000", "0100000"), 
+                "xor":FieldData("0110011", "100", "0000000"), 
+                "or": FieldData("0110011", "110", "0000000"), 
+                "and":FieldData("0110011", "111", "0000000"), 
+                "sll":FieldData("0110011", "001", "0000000"),
+                "srl":FieldData("0110011", "101", "0000000"), 
+                "sra":FieldData("0110011", "101", "0100000"), 
+                "slt":FieldData("0110011", "010", "0000000"), 
+                #I Types and S Types
+                "addi":FieldData("0010011", "000"), 
+                "xori":FieldData("0010011", "100"), 
+                "ori": FieldData("0010011", "110"), 
+                "andi":FieldData("0010011", "111"), 
+                "slli":FieldData("0010011", "001"), 
+                "srli":FieldData("0010011", "101"),
+                "srai":FieldData("0010011", "101"), 
+                "lw":  FieldData("0000011", "010"), 
+                "sw":  FieldData("0100011", "010"), 
+                "jalr":FieldData("1100111", "000"),
+                #SB Types
+                "beq":FieldData("1100011", "000"), 
+                "bne":FieldData("1100011", "001"), 
+                "blt":FieldData("1100011", "100"), 
+                "bge":FieldData("1100011", "101"), 
+                #U and UJ Types
+                "jal":FieldData("1101111"), 
+                "lui":FieldData("0110111")
+                }
+"""Dictionay mapping instruction name to the different fields as a FieldData object"""
+
+#dictionary that maps register names to their ID numbers (in decimal)
+register_name_to_num = {"x0":0, "zero":0, "x1":1, "ra":1,
+                        "x2":2, "sp":2, "x3":3, "gp":3, 
+                        "x4":4, "tp":4, "x5":5, "t0":5,
+                        "x6":6, "t1":6, "x7":7, "t2":7,
+                        "x8":8, "s0":8, "fp":8, 
+                        "x9":9, "s1":9, "x10":10, "a0":10, 
+                        "x11":11, "a1":11, "x12":12, "a2":12,
+                        "x13":13, "a3":13, "x14":14, "a4":14,
+                        "x15":15, "a5":15, "x16":16, "a6":16,
+                        "x17":17, "a7":17, "x18":18, "s2":18,
+                        "x19":19, "s3":19, "x20":20, "s4":20,
+                        "x21":21, "s5":21, "x22":22, "s6":22,
+                        "x23":23, "s7":23, "x24":24, "s8":24,
+                        "x25":25, "s9":25, "x26":26, "s10":26,
+                        "x27":27, "s11":27, "x28":28, "t3":28,
+                        "x29":29, "t4":29, "x30":30, "t5":30,
+                        "x31":31, "t6":31, "at":31
+                        }
+"""Dictionary that maps register names to their ID numbers (in decimal)"""
+
+#interned for the same reason as the mnemonic table above, and frozen
+#read-only since every consumer treats it as a constant
+register_name_to_num = MappingProxyType({sys.intern(k): v for k, v in register_name_to_num.items()})
+
+#every register's 5-bit field precomputed once at import time
+REG_BIN = {name: format(num, "05b") for name, num in register_name_to_num.items()}
+"""Dictionary that maps register names to their 5-bit binary field strings"""
+
+def is_register_name(name):
+    """Returns True if the provided name is a valid register name or x value."""
+    return name in REG_BIN
+
+def get_register_bin(name):
+    """Returns the binary string version of a register ID given its name."""
+    try:
+        return REG_BIN[name]
+    except KeyError:
+        raise BadRegister("Found unknown register name: \n\t%s\n" % name)
+
+def get_register_num(name):
+    """Returns the register ID as an int given its name."""
+    try:
+        return register_name_to_num[name]
+    except KeyError:
+        raise BadRegister("Found unknown register name: \n\t%s\n" % name)
+    
+#shift-immediate mnemonics, frozen once so membership is a hash probe
+_SHIFT_IMM_INSTS = frozenset(("slli", "srli", "srai"))
+
+def is_shift_immediate_inst(inst):
+    """Returns true if this is a shift immediate instruction."""
+    return inst in _SHIFT_IMM_INSTS
+
+def is_core_inst(inst):
+    """Returns true if this instruction is in our list of core instructions."""
+    return inst in inst_to_types
+
+def parse_base_offset(operand_string):
+    """Takes in the base-offset address field from memory instructions
+        returns a tuple including the binary immediate and binary register.
+
+        Assumes the immediate is in decimal.
+
+        e.g. `lw t0, 4(t1)` will lead to this behavior:
+
+            `parse_base_offset("4(t1)") -> ("000000000100", "00110")` """
+    #one partition separates offset and base without a list allocation
+    imm_str, sep, rest = operand_string.partition("(")
+    if(not sep or not rest.endswith(")")):
+        raise BadImmediate("Parsing base-offset address, inappropriate number of elements: \n\t%s\n" % operand_string)
+
+    return (dec_to_bin(imm_str), get_register_bin(rest[:-1]))
+
+def verify_field_sizes(inst_list, inst_type, line_num):
+    """Takes in a list where each element is a binary string of one field 
+        of an instruction `inst_type` is the Type of the instruction, and 
+        `line_num` is the instruction index in the assembled program 
+        (`line_num` is only used for error output).
+
+        For example, you could call it this way:
+
+            verify_field_sizes((funct7, rs2, rs1, funct3, rd, opcode), Types.R, 23) 
+        
+        And it would check that all the various funct7, etc values are an
+        appropriate number of bits (well, actually characters since they're
+        strings of ones and zeroes).
+    """
+    raise NotImplementedError
+
+def is_int(s):
+    """Checks if a given string can be an integer or not."""
+    #cheap no-allocation answer for plain decimal operands, which are the
+    #overwhelmingly common case; fall back to a real parse otherwise
+    t = s[1:] if s[:1] in "+-" else s
+    if(t.isdigit()):
+        return True
+    try:
+        int(s)
+    except ValueError:
+        return False
+    return True
+
+###### Functions to convert between different bases #####
+
+def _check_imm(value, bits, signed=True):
+    """Raises BadImmediate if `value` does not fit in `bits` bits
+        (two's compliment range when `signed`, 0..2^bits-1 otherwise)."""
+    lo, hi = (-1 << (bits - 1), (1 << (bits - 1)) - 1) if signed else (0, (1 << bits) - 1)
+    if(value < lo or value > hi):
+        raise BadImmediate("Immediate value outside of bounds")
+
+#format specs for the field sizes the assembler actually uses, built once
+#so dec_to_bin does not construct a spec string per call
+_BIN_FMT = {5: "05b", 7: "07b", 12: "012b", 20: "020b", 32: "032b"}
+
+def parse_imm(value, size=12):
+    """Takes an immediate operand (as int or string) and returns it as an int
+        masked to `size` bits of two's compliment."""
+
+    if(type(value) == str):
+        try:
+            value = int(value)
+        except ValueError:
+            raise BadImmediate("Failed to parse value as an integer: %s" % (value))
+
+    if(value >= 2**size):
+        raise BadImmediate("Not enough bits (%s) to represent the decimal number: %s" % (size, value))
+
+    return value & ((1 << size) - 1)
+
+@lru_cache(maxsize=4096)
+def dec_to_bin(decimal, size=12):
+    """Takes a decimal numer (as int or string) and returns the
+        binary representation with number of bits equal to `size`.
+        Uses the two's compliment representation for negative numbers."""
+
+    fmt = _BIN_FMT.get(size)
+    return format(parse_imm(decimal, size), fmt if fmt else "0%db" % size)
+
+def encode(word):
+    """Takes a complete 32-bit instruction word as an int and formats it
+        once into the spaced binary string the assembler outputs."""
+    b = format(word, "032b")
+    return f"{b[0:4]} {b[4:8]} {b[8:12]} {b[12:16]} {b[16:20]} {b[20:24]} {b[24:28]} {b[28:32]}"
+
+def join_inst_fields_bin(inst_list):
+    """Takes a list of binary strings and joins them together 
+        and grouping into 4 character slices."""
+    b = "".join(inst_list).replace(" ", "").zfill(32)
+    return f"{b[0:4]} {b[4:8]} {b[8:12]} {b[12:16]} {b[16:20]} {b[20:24]} {b[24:28]} {b[28:32]}"
+
+def bin_to_hex(bin_string):
+    """Takes a binary string and converts it into a hex string."""
+    if(bin_string is None):
+        return
+    #remove any whitespace in the string
+    if(" " in bin_string):
+        bin_string = bin_string.replace(" ", "")
+    #format() gives the zero-padded width directly, no '0x' to strip off
+    return format(int(bin_string, 2), "08x")
+
+#cached wrapper used when formatting the listing; identical machine words
+#(e.g. repeated nops) recur often, so each one is only converted once
+_bin_to_hex_cached = lru_cache(maxsize=4096)(bin_to_hex)
+
+
+
 ##############
 #
 # Actual Assembler Methods
@@ -117,7 +406,7 @@ def Assemble(inst, line_num=0, labels=None):
     """Takes an instruction as a string, splits it into parts, and then calls the correct helper
         to assemble it, returning the result.
         The optional parameter `labels` should be a Dictionary mapping Label strings 
-        to addresses.
+        to instruction indices.
         
         This function and the helpers should raise exceptions when invalid instructions are
         encountered. See the exceptions types defined below in this file, they are all named 
@@ -133,34 +422,45 @@ def Assemble(inst, line_num=0, labels=None):
         The spacing is intended to make debugging easier.
         """
 
-    split_inst = inst.strip().replace(",", " ").split()
-    cmd = split_inst[0]
-    args = split_inst[1:]
-
-
-    type = inst_to_types.get(cmd)
-
-    # index_to_address(4)
-    result = ""
-    match type:
-        case Types.R:
-            result = Assemble_R_Type(cmd, args, line_num)
-        case Types.I:
-            if(cmd == 'lw' or cmd == "jalr"):
-                result = Assemble_I_Type_base_offset(cmd, args, line_num)
-            else:
-                result = Assemble_I_Type(cmd, args, line_num)
-        case Types.S:
-            result = Assemble_S_Type(cmd,args,line_num) 
-        case Types.U:
-            result = Assemble_U_Type(cmd, args, line_num)  
-        case Types.UJ:
-            result = Assemble_UJ_Type(cmd, args, line_num,labels) 
-        case Types.SB:
-            result = Assemble_SB_Type(cmd, args, line_num,labels )      
-    return result
-
-def Assemble_R_Type(cmd, operands, line_num):
+    cmd, args = _tokenize(inst)
+    return _assemble_tokens(cmd, args, line_num, labels)
+
+def _tokenize(line):
+    """Splits an instruction into its mnemonic and a tuple of operands."""
+    tokens = _TOKEN_RE.split(line.strip())
+    return sys.intern(tokens[0]), tuple(tokens[1:])
+
+def _assemble_tokens(cmd, args, line_num, labels):
+    """Assembles an already-tokenized instruction, memoizing the
+        position-independent instruction families."""
+    entry = CMD_DISPATCH.get(cmd)
+    if(entry == None):
+        raise BadInstruction("Found unknown instruction: \n\t%s\n" % cmd)
+    handler, needs_labels = entry
+    if(needs_labels):
+        #PC-relative encodings depend on the line number and the (mutable)
+        #labels dictionary, so they cannot be cached safely; branch targets
+        #rarely repeat anyway, so call the handler directly
+        return handler(cmd, list(args), line_num, labels)
+    #everything else encodes identically wherever it appears, so identical
+    #instructions share one cache entry
+    try:
+        return _assemble_core(cmd, args)
+    except Exception:
+        #the cached worker assembles at line 0; re-run uncached so the
+        #raised error reports the real line number
+        return handler(cmd, list(args), line_num)
+
+@lru_cache(maxsize=4096)
+def _assemble_core(cmd, args):
+    """Cached worker for position-independent instructions. Repeated
+        instructions (common in real programs) skip all parsing and encoding
+        work on cache hits."""
+    handler, needs_labels = CMD_DISPATCH[cmd]
+    return handler(cmd, list(args), 0)
+
+def Assemble_R_Type(cmd, operands, line_num, labels=None,
+                    _reg=get_register_num, _fields=inst_to_fields, _encode=encode):
     """Takes an R Type instruction name and its operands (as a list) and 
         returns the appropriate binary string. A basic call would look like:
         
@@ -183,31 +483,18 @@ def Assemble_R_Type(cmd, operands, line_num):
     if(len(operands) != 3):
         raise BadOperands("Incorrect number of operands found in R Type on line %s with args:\n\t%s %s\n" % (line_num, cmd, operands))
 
-    field_data = inst_to_fields[cmd]
+    field_data = _fields[cmd]
 
-    rd  = get_register_bin(operands[0])
-    rs1 = get_register_bin(operands[1])
-    rs2 = get_register_bin(operands[2])
-
-    if(not is_register_name(operands[2])):
-        raise BadRegister()
-    
-    if(not is_register_name(operands[1])):
-        raise BadRegister()
-    
-    if(not is_register_name(operands[0])):
-        raise BadRegister()
+    rd  = _reg(operands[0])
+    rs1 = _reg(operands[1])
+    rs2 = _reg(operands[2])
 
-    inst_field_list = [field_data.func7,
-                       rs2,
-                       rs1,
-                       field_data.func3,
-                       rd, 
-                       field_data.opcode]
+    word = field_data.r_partial | (rs2 << 20) | (rs1 << 15) | (rd << 7)
 
-    return join_inst_fields_bin(inst_field_list)
+    return _encode(word)
 
-def Assemble_I_Type(cmd, operands, line_num):
+def Assemble_I_Type(cmd, operands, line_num, labels=None,
+                    _reg=get_register_num, _fields=inst_to_fields, _encode=encode):
     """Takes an I Type instruction name and its operands (as a list) and 
         returns the appropriate binary string.
 
@@ -231,25 +518,20 @@ def Assemble_I_Type(cmd, operands, line_num):
     if(not is_core_inst(cmd)):
         raise BadInstruction()
     
-    field_data = inst_to_fields[cmd]
+    field_data = _fields[cmd]
 
-    rd  = get_register_bin(operands[0])
-    rs1 = get_register_bin(operands[1])
-    imm = dec_to_bin(operands[2], size = 12)
+    rd  = _reg(operands[0])
+    rs1 = _reg(operands[1])
+    imm = parse_imm(operands[2], size = 12)
 
-    
+    word = field_data.i_partial | (imm << 20) | (rs1 << 15) | (rd << 7)
 
-    inst_field_list = [imm,
-                       rs1,
-                       field_data.func3,
-                       rd, 
-                       field_data.opcode]
+    return _encode(word)
 
-    return join_inst_fields_bin(inst_field_list)
-    
 
 
-def Assemble_I_Type_shift(cmd, operands, line_num):
+def Assemble_I_Type_shift(cmd, operands, line_num, labels=None,
+                    _reg=get_register_num, _fields=inst_to_fields, _encode=encode):
     """Takes an I Type instruction name and its operands and returns 
         the appropriate binary string.
 
@@ -275,8 +557,7 @@ def Assemble_I_Type_shift(cmd, operands, line_num):
         """
 
 
-    if(int(operands[2]) < 0 or int(operands[2]) > 13):
-        raise BadImmediate("Immediate value outside of bounds")
+    _check_imm(int(operands[2]), 5, signed=False)
 
     if(len(operands) != 3):
         raise BadOperands("Incorrect number of operands found in R Type on line %s with args:\n\t%s %s\n" % (line_num, cmd, operands))
@@ -288,26 +569,21 @@ def Assemble_I_Type_shift(cmd, operands, line_num):
     
     
 
-    field_data = inst_to_fields[cmd]
+    field_data = _fields[cmd]
 
-    rd  = get_register_bin(operands[0])
-    rs1 = get_register_bin(operands[1])
-    imm = dec_to_bin(operands[2], size = 12)
+    rd  = _reg(operands[0])
+    rs1 = _reg(operands[1])
+    imm = parse_imm(operands[2], size = 12)
 
     if(cmd == "srai"):
-        imm = '010000' + imm[6:13]
+        imm = (0b010000 << 6) | (imm & 0x3f)
 
-    
+    word = field_data.i_partial | (imm << 20) | (rs1 << 15) | (rd << 7)
 
-    inst_field_list = [imm,
-                       rs1,
-                       field_data.func3,
-                       rd, 
-                       field_data.opcode]
+    return _encode(word)
 
-    return join_inst_fields_bin(inst_field_list)
-
-def Assemble_I_Type_base_offset(cmd, operands, line_num):
+def Assemble_I_Type_base_offset(cmd, operands, line_num, labels=None,
+                    _reg=get_register_num, _fields=inst_to_fields, _encode=encode):
     """Takes the operands for a lw or jalr instruction and returns the 
         appropriate binary string. You may want to implement and use
         the `parse_base_offset` helper method before writing this code.
@@ -335,53 +611,42 @@ def Assemble_I_Type_base_offset(cmd, operands, line_num):
 
     if(not is_core_inst(cmd)):
         raise BadInstruction()
-    
+
     if(len(operands) != 2 and cmd != "jalr"):
         raise BadOperands()
-    if (cmd == 'jalr') and len(operands) == 3:
-        if operands[2].isdecimal() and not operands[1].isdecimal():
-            operands[1], operands[2] = operands[2], operands[1]
-
-            if not (operands[2].startswith('(') and operands[2].endswith(')')):
-                operands[2] = f"({operands[2]})"
-
 
+    rd = _reg(operands[0])
 
     if(cmd == "jalr" and len(operands) == 3):
-        rs1 = parse_base_offset(operands[1] + operands[2])[1]
- 
-    else:
-        rs1 = parse_base_offset(operands[1])[1]
-
-    rd = get_register_bin(operands[0])
-
-    if(operands[1][0] == '-'):
-        imm = dec_to_bin(operands[1][0:2], size = 12)
-
+        #either the standard I-type format `jalr rd, rs1, imm` or the
+        #base-offset form with a space: `jalr rd, imm (rs1)`
+        if(is_register_name(operands[1])):
+            rs1 = _reg(operands[1])
+            imm = parse_imm(operands[2], size = 12)
+        else:
+            m = _BASE_OFFSET_RE.fullmatch(operands[1] + operands[2])
+            if(m == None):
+                raise BadImmediate("Parsing base-offset address, could not parse: \n\t%s %s\n" % (operands[1], operands[2]))
+            imm = parse_imm(m.group(1), size = 12)
+            rs1 = _reg(m.group(2))
+    elif(len(operands) == 2):
+        m = _BASE_OFFSET_RE.fullmatch(operands[1])
+        if(m == None):
+            raise BadImmediate("Parsing base-offset address, could not parse: \n\t%s\n" % operands[1])
+        imm = parse_imm(m.group(1), size = 12)
+        rs1 = _reg(m.group(2))
     else:
-        imm = dec_to_bin(operands[1][0], size = 12)
-
+        raise BadOperands()
 
- 
-    
-    field_data = inst_to_fields[cmd]
+    field_data = _fields[cmd]
 
-    inst_field_list = [imm,
-                       rs1,
-                       field_data.func3,
-                       rd, 
-                       field_data.opcode]
+    word = field_data.i_partial | (imm << 20) | (rs1 << 15) | (rd << 7)
 
-    return join_inst_fields_bin(inst_field_list)
+    return _encode(word)
     
 
-def Assemble_I_Type_from_fields(imm, rs1, func3, rd, opcode, line_num):
-    """Helper function for I Types to be called after the immediate has 
-        been processed by the main I Type functions."""
-
-    return "0000 0000 0000 0000 0000 0000 0000 0000"
-
-def Assemble_S_Type(cmd, operands, line_num):
+def Assemble_S_Type(cmd, operands, line_num, labels=None,
+                    _reg=get_register_num, _fields=inst_to_fields, _encode=encode):
     """Takes the operands for an S Type instruction and returns the 
         appropriate binary string.
 
@@ -407,49 +672,28 @@ def Assemble_S_Type(cmd, operands, line_num):
         raise BadOperands()
       
  
-    rs2 = get_register_bin(operands[0])
+    rs2 = _reg(operands[0])
 
-    if(operands[1][0] == '-'):
-        rs1 = get_register_bin(operands[1].split('(')[1].rstrip(')'))
-        if(rs1.isdigit == False):
-            raise BadRegister()
-    else:
-        rs1 = get_register_bin(operands[1].split('(')[1].rstrip(')'))
-        if(rs1.isdigit == False):
-            raise BadRegister()
+    m = _BASE_OFFSET_RE.fullmatch(operands[1])
+    if(m == None):
+        raise BadImmediate("Parsing base-offset address, could not parse: \n\t%s\n" % operands[1])
+    imm = parse_imm(m.group(1), size = 12)
+    rs1 = _reg(m.group(2))
 
-    if(operands[1][0] == '-'):
-        imm = dec_to_bin(operands[1].split('(')[0], size = 12)
-        # if(operands[1][0:2] < -(2^11)):
-        #     raise BadImmediate()
-    else:
-        imm = dec_to_bin(operands[1].split('(')[0], size = 12)
-        # if(operands[1][0] > 2^11-1):
-        #     raise BadImmediate()
+    field_data = _fields[cmd]
 
-   # if(int(imm) > 2^11-1 or int(imm) < -(2^11)):
-    #    raise BadImmediate()
+    word = (field_data.i_partial | ((imm >> 5) << 25) | (rs2 << 20)
+            | (rs1 << 15) | ((imm & 0x1f) << 7))
 
-    firstBits = imm[:7]
-    secondBits = imm[7:]
-    
-    field_data = inst_to_fields[cmd]
-
-    inst_field_list = [firstBits,
-                       rs2,
-                       rs1,
-                       field_data.func3,
-                       secondBits, 
-                       field_data.opcode]
-
-    return join_inst_fields_bin(inst_field_list)
+    return _encode(word)
 
 def format_address(address):
     register = address[0]
     offset = address[1:]
     return f"{offset}({register})"
 
-def Assemble_SB_Type(cmd, operands, line_num, labels=None):
+def Assemble_SB_Type(cmd, operands, line_num, labels=None,
+                    _reg=get_register_num, _fields=inst_to_fields, _encode=encode):
     """Takes an SB Type instruction name and its operands (as a list) 
         and returns the appropriate binary string. 
         
@@ -487,19 +731,25 @@ def Assemble_SB_Type(cmd, operands, line_num, labels=None):
     
     if(len(operands) == 3):
         offset = operands[2]
-        if(offset.isdecimal() or offset[0] == '-'): 
-            imm = (dec_to_bin(int(offset) >> 1))
+        if(offset.isdecimal() or offset[0] == '-'):
+            offset = int(offset)
         elif(is_register_name(offset)):
             raise BadImmediate()
         else:
-            imm = dec_to_bin(int(label_to_offset(labels, offset, line_num)) >> 1)
+            try:
+                offset = (labels[offset] - line_num) << 2
+            except (KeyError, TypeError):
+                raise BadLabel("Found unknown label: \n\t%s\n" % offset)
     elif(len(operands) == 2):
-        imm = 0
+        offset = 0
     else:
         raise BadOperands()
+
+    if((offset >> 1) >= 2**12):
+        raise BadImmediate("Not enough bits (12) to represent the offset: %s" % offset)
       
-    rs1 = get_register_bin(operands[0])
-    rs2 = get_register_bin(operands[1])
+    rs1 = _reg(operands[0])
+    rs2 = _reg(operands[1])
 
     # if(int(imm) > 2**20-1 or int(imm) < -2**20):
     #     raise BadImmediate()
@@ -540,26 +790,24 @@ def Assemble_SB_Type(cmd, operands, line_num, labels=None):
 
     # imm = str(imm)
 
-    firstBits = imm[0]
-    secondBits = imm[2:8]
-    thirdBits = imm[8:12]
-    lastBits = imm[1]
-    
-    field_data = inst_to_fields[cmd]
+    #slice the shifted offset into the scrambled SB field order with bit ops
+    #instead of cutting up an intermediate binary string
+    imm_i = (offset >> 1) & 0xfff
+    imm12   = (imm_i >> 11) & 1
+    imm11   = (imm_i >> 10) & 1
+    imm10_5 = (imm_i >> 4) & 0x3f
+    imm4_1  = imm_i & 0xf
 
-    first_imm = firstBits + secondBits
+    field_data = _fields[cmd]
 
-    inst_field_list = [first_imm,
-                       rs2,
-                       rs1,
-                       field_data.func3,
-                       thirdBits + lastBits, 
-                       field_data.opcode]
+    word = (field_data.i_partial | (imm12 << 31) | (imm10_5 << 25)
+            | (rs2 << 20) | (rs1 << 15) | (imm4_1 << 8) | (imm11 << 7))
 
-    return join_inst_fields_bin(inst_field_list)
+    return _encode(word)
         
 
-def Assemble_U_Type(cmd, operands, line_num):
+def Assemble_U_Type(cmd, operands, line_num, labels=None,
+                    _reg=get_register_num, _fields=inst_to_fields, _encode=encode):
     """Takes an U Type instruction name and its operands 
         (as a list) and returns the appropriate binary string.
 
@@ -584,41 +832,30 @@ def Assemble_U_Type(cmd, operands, line_num):
         raise BadOperands()
     
     if(operands[0][0] == '-'):
-        rd = get_register_bin(operands[0])
+        rd = _reg(operands[0])
         # if(rs1.isdigit == False):
         #     raise BadRegister()
     else:
-        rd = get_register_bin(operands[0])
+        rd = _reg(operands[0])
         # if(rs1.isdigit == False):
         #     raise BadRegister()
         
-    if(operands[1][0] == '-'):
-        if(operands[1][1:].isdecimal()):
-            if(int(operands[1]) < -524288 or int(operands[1]) > 524287):
-                raise BadImmediate("Immediate value outside of bounds")
-        else:
-            raise BadImmediate()
-    else:
-        if(operands[1].isdecimal()):
-            if(int(operands[1]) < -524288 or int(operands[1]) > 524287):
-                raise BadImmediate("Immediate value outside of bounds")
-        else:
-            raise BadImmediate()
-    
-    imm = dec_to_bin(operands[1], size = 20)
+    if(not is_int(operands[1])):
+        raise BadImmediate()
+    _check_imm(int(operands[1]), 20)
 
-    
-    field_data = inst_to_fields[cmd]
+    imm = parse_imm(operands[1], size = 20)
 
-    inst_field_list = [imm,
-                       rd,
-                       field_data.opcode]
+    field_data = _fields[cmd]
 
-    return join_inst_fields_bin(inst_field_list)
-    
+    word = field_data.u_partial | (imm << 12) | (rd << 7)
+
+    return _encode(word)
 
 
-def Assemble_UJ_Type(cmd, operands, line_num, labels):
+
+def Assemble_UJ_Type(cmd, operands, line_num, labels=None,
+                    _reg=get_register_num, _fields=inst_to_fields, _encode=encode):
     """Takes an UJ Type instruction name and its operands 
         (as a list) and returns the appropriate binary string.
 
@@ -651,41 +888,69 @@ def Assemble_UJ_Type(cmd, operands, line_num, labels):
         raise BadOperands()
     
     if(operands[0][0] == '-'):
-        rd = get_register_bin(operands[0])
+        rd = _reg(operands[0])
         # if(rs1.isdigit == False):
         #     raise BadRegister()
     else:
-        rd = get_register_bin(operands[0])
+        rd = _reg(operands[0])
         # if(rs1.isdigit == False):
         #     raise BadRegister()
    
     if(is_int(operands[1])):
-        if(int(operands[1]) < -2**20 or int(operands[1]) > 2**20-1):
-                raise BadImmediate("Immediate value outside of bounds")
-        
         offset = int(operands[1])
+        _check_imm(offset, 21)
     else:
         if(is_register_name(operands[1])):
             raise BadImmediate()
-        offset = label_to_offset(labels, operands[1], line_num)
+        try:
+            offset = (labels[operands[1]] - line_num) << 2
+        except (KeyError, TypeError):
+            raise BadLabel("Found unknown label: \n\t%s\n" % operands[1])
     
 
-    imm = dec_to_bin(offset >> 1, 20)
+    if((offset >> 1) >= 2**20):
+        raise BadImmediate("Not enough bits (20) to represent the offset: %s" % offset)
 
-    first_bit = imm[0]          
-    second_bits = imm[1:9]     
-    third_bit = imm[9]         
-    fourth_bits = imm[10:20]    
+    #reorder the shifted offset into the scrambled UJ field order with bit ops
+    #instead of cutting up an intermediate binary string
+    imm_i = (offset >> 1) & 0xfffff
+    imm20    = (imm_i >> 19) & 1
+    imm19_12 = (imm_i >> 11) & 0xff
+    imm11    = (imm_i >> 10) & 1
+    imm10_1  = imm_i & 0x3ff
 
-    total_imm = first_bit + fourth_bits + third_bit + second_bits
-    
-    field_data = inst_to_fields[cmd]
+    total_imm = (imm20 << 19) | (imm10_1 << 9) | (imm11 << 8) | imm19_12
+
+    field_data = _fields[cmd]
 
-    inst_field_list = [total_imm,
-                       rd,
-                       field_data.opcode]
+    word = field_data.u_partial | (total_imm << 12) | (rd << 7)
 
-    return join_inst_fields_bin(inst_field_list)
+    return _encode(word)
+
+##############
+#
+# Dispatch tables (built after the handlers they reference)
+#
+##############
+
+#dictionary mapping each Type to its handler and whether it needs labels
+_TYPE_TO_HANDLER = {Types.R:  (Assemble_R_Type, False),
+                    Types.I:  (Assemble_I_Type, False),
+                    Types.S:  (Assemble_S_Type, False),
+                    Types.U:  (Assemble_U_Type, False),
+                    Types.UJ: (Assemble_UJ_Type, True),
+                    Types.SB: (Assemble_SB_Type, True)
+                    }
+
+#dispatch table built once at import time so Assemble is a single dict lookup
+CMD_DISPATCH = {cmd: _TYPE_TO_HANDLER[t] for cmd, t in inst_to_types.items()}
+CMD_DISPATCH["lw"] = CMD_DISPATCH["jalr"] = (Assemble_I_Type_base_offset, False)
+"""Dictionary mapping instruction name to an (Assemble_*_Type handler, needs_labels) pair"""
+
+#mnemonics whose encoding is PC-relative and so depends on line_num and labels
+LABEL_DEPENDENT_CMDS = frozenset(cmd for cmd, (handler, needs_labels)
+                                 in CMD_DISPATCH.items() if needs_labels)
+"""Set of mnemonics whose encoding depends on the instruction's position"""
 
 ##############
 #
@@ -707,37 +972,33 @@ def parse_labels(asm_list):
     """Takes in a list where each entry is either a label, an instruction, 
         or a label and an instruction. Assumes there are no comments in this code.
         Returns a tuple containing a new list of only instructions (the labels 
-        having been removed), and a dictionary mapping labels to addresses
-        in the instruction list."""
-    
+        having been removed), and a dictionary mapping labels to indices
+        in the instruction list (see `index_to_address` for the memory
+        address of an index)."""
 
     instructions = []
     label_dict = {}
-    address = 0x00400000 # Address index starts at 0 and increments per instruction
-    
+
     for line in asm_list:
         # Split the line into potential label and instruction
         parts = line.split(":", maxsplit=1)
         
         if len(parts) == 2:
-            # If there's a label, map it to the current address
+            # If there's a label, map it to the index of the next instruction
             label = parts[0].strip()
 
-            if( label in label_dict.keys()):
+            if(label in label_dict):
                 raise BadLabel()
             
-            label_dict[label] = address
+            label_dict[label] = len(instructions)
             
             # Check if there's an instruction after the label
             instruction = parts[1].strip()
             if instruction:
                 instructions.append(instruction)
-                address += 0X4
         else:
             # No label, just an instruction
-            instruction = parts[0].strip()
-            instructions.append(instruction)
-            address += 0X4
+            instructions.append(parts[0].strip())
     
     return instructions, label_dict
 
@@ -746,31 +1007,18 @@ def index_to_address(index):
       of the instruction, assuming the program starts at the beginning 
       of the text segment of memory."""
 
-    pc = 0x00400000
-    address = pc + index * 4
-    return address
+    return TEXT_BASE + index * 4
 
 def label_to_offset(labels, label, instruction_index):
-    """Takes in the dictionary of labels, a label of interest and a 
-        current instruction-index (not an address). Returns the byte offset between 
-        the label and PC calculated from the instruction index."""
+    """Takes in the dictionary of labels (mapping label to instruction
+        index), a label of interest and a current instruction-index (not an
+        address). Returns the byte offset between the label and PC calculated
+        from the instruction index."""
 
-    if(len(labels) == 0):
-        pointer = 0x00400000
-
-    elif(label not in labels):
-        raise BadLabel()
-    
-    else:
-        pointer = labels[label]
-    
-    # Calculate the instruction offset
-    instruction_offset = index_to_address(instruction_index)
-    
-    # Convert instruction offset to byte offset (each instruction is 4 bytes)
-  #  byte_offset = instruction_offset * 4
-    
-    return pointer - instruction_offset
+    try:
+        return (labels[label] - instruction_index) << 2
+    except (KeyError, TypeError):
+        raise BadLabel("Found unknown label: \n\t%s\n" % label)
 
 def split_out_label(line):
     """Takes a line of raw assembly code and splits any label from the beginning
@@ -833,222 +1081,29 @@ def output(machine_code, clean_code, labels, mode = None, out = None):
 
     Addresses of each instruction are always printed in the comments.
     """
-    i = int("00400000", 16)
-    address_to_label = {v:k for (k,v) in labels.items()}
-    for m, c in zip(machine_code, clean_code):
-        label = "\t"
-        if(i in address_to_label):
-            label = address_to_label[i] + ":\t"
-        if(not mode):
-            s = ("%s // 0x%s ;;; %s - %s%s " % (m, bin_to_hex(m), hex(i), label, c.rstrip()))
-        elif (mode == "bin"):
-            s = ("%s // %s - %s%s " % (m, hex(i), label, c.rstrip()))
-        else:
-            s = ("%s // %s - %s%s " % (bin_to_hex(m), hex(i), label, c.rstrip()))
+    i = TEXT_BASE
+    address_to_label = {index_to_address(v):k for (k,v) in labels.items()}
+
+    #pick the line formatter once, rather than re-testing mode on every line
+    if(not mode):
+        def fmtline(m, i, label, c):
+            return "%s // 0x%s ;;; %s - %s%s \n" % (m, _bin_to_hex_cached(m), hex(i), label, c.rstrip())
+    elif(mode == "bin"):
+        def fmtline(m, i, label, c):
+            return "%s // %s - %s%s \n" % (m, hex(i), label, c.rstrip())
+    else:
+        def fmtline(m, i, label, c):
+            return "%s // %s - %s%s \n" % (_bin_to_hex_cached(m), hex(i), label, c.rstrip())
 
-        if(out):
-            out.write(s+"\n")
-        else:
-            print(s)
+    buf = []
+    for m, c in zip(machine_code, clean_code):
+        label = address_to_label.get(i)
+        label = "\t" if label == None else label + ":\t"
+        buf.append(fmtline(m, i, label, c))
         i += 4
 
-##############
-#
-# Utilities 
-#
-##############
-
-#Enum of Types
-Types = Enum("Types", ["R", "I", "S", "SB", "U", "UJ", "PSEUDO"])
-"""Enum of instruction Types"""
-
-#dictionary mapping instruction name to types
-inst_to_types = {#R types
-                "add":Types.R, "sub":Types.R, "xor":Types.R, "or":Types.R, "and":Types.R, "sll":Types.R,
-                "srl":Types.R, "sra":Types.R, "slt":Types.R, 
-                #I Types and S Types
-                "addi":Types.I, "xori":Types.I, "ori":Types.I, "andi":Types.I, "slli":Types.I, "srli":Types.I,
-                "srai":Types.I, "lw":Types.I, "sw":Types.S, "jalr":Types.I,
-                #SB Types
-                "beq":Types.SB, "bne":Types.SB, "blt":Types.SB, "bge":Types.SB, 
-                #U and UJ Types
-                "jal":Types.UJ, "lui":Types.U
-                }
-"""Dictionary mapping instruction name to types"""
-
-class FieldData():
-    """
-    Struct to hold data for different fields of instructions.
-    """
-    def __init__(self, opcode, func3=None, func7=None):
-        self.opcode = opcode
-        self.func7 = func7
-        self.func3 = func3
-        
-
-#dictionay mapping instruction name to the different fields as a FieldData object
-inst_to_fields = {#R types
-                "add":FieldData("0110011", "000", "0000000"), 
-                "sub":FieldData("0110011", "000", "0100000"), 
-                "xor":FieldData("0110011", "100", "0000000"), 
-                "or": FieldData("0110011", "110", "0000000"), 
-                "and":FieldData("0110011", "111", "0000000"), 
-                "sll":FieldData("0110011", "001", "0000000"),
-                "srl":FieldData("0110011", "101", "0000000"), 
-                "sra":FieldData("0110011", "101", "0100000"), 
-                "slt":FieldData("0110011", "010", "0000000"), 
-                #I Types and S Types
-                "addi":FieldData("0010011", "000"), 
-                "xori":FieldData("0010011", "100"), 
-                "ori": FieldData("0010011", "110"), 
-                "andi":FieldData("0010011", "111"), 
-                "slli":FieldData("0010011", "001"), 
-                "srli":FieldData("0010011", "101"),
-                "srai":FieldData("0010011", "101"), 
-                "lw":  FieldData("0000011", "010"), 
-                "sw":  FieldData("0100011", "010"), 
-                "jalr":FieldData("1100111", "000"),
-                #SB Types
-                "beq":FieldData("1100011", "000"), 
-                "bne":FieldData("1100011", "001"), 
-                "blt":FieldData("1100011", "100"), 
-                "bge":FieldData("1100011", "101"), 
-                #U and UJ Types
-                "jal":FieldData("1101111"), 
-                "lui":FieldData("0110111")
-                }
-"""Dictionay mapping instruction name to the different fields as a FieldData object"""
-
-#dictionary that maps register names to their ID numbers (in decimal)
-register_name_to_num = {"x0":0, "zero":0, "x1":1, "ra":1,
-                        "x2":2, "sp":2, "x3":3, "gp":3, 
-                        "x4":4, "tp":4, "x5":5, "t0":5,
-                        "x6":6, "t1":6, "x7":7, "t2":7,
-                        "x8":8, "s0":8, "fp":8, 
-                        "x9":9, "s1":9, "x10":10, "a0":10, 
-                        "x11":11, "a1":11, "x12":12, "a2":12,
-                        "x13":13, "a3":13, "x14":14, "a4":14,
-                        "x15":15, "a5":15, "x16":16, "a6":16,
-                        "x17":17, "a7":17, "x18":18, "s2":18,
-                        "x19":19, "s3":19, "x20":20, "s4":20,
-                        "x21":21, "s5":21, "x22":22, "s6":22,
-                        "x23":23, "s7":23, "x24":24, "s8":24,
-                        "x25":25, "s9":25, "x26":26, "s10":26,
-                        "x27":26, "s11":27, "x28":28, "t3":28,
-                        "x29":29, "t4":29, "x30":30, "t5":30,
-                        "x31":31, "at":31
-                        }
-"""Dictionary that maps register names to their ID numbers (in decimal)"""
-
-def is_register_name(name):
-    """Returns True if the provided name is a valid register name or x value."""
-    return name in register_name_to_num.keys()
-
-def get_register_bin(name):
-    """Returns the binary string version of a register ID given its name."""
-    if(name not in register_name_to_num.keys()):
-        raise BadRegister("Found unknown register name: \n\t%s\n" % name)
-        
-    binary_string = format(register_name_to_num[name], "#05b")[2:]
-    return "0"*(5-len(binary_string)) + binary_string
-    
-def is_shift_immediate_inst(inst):
-    """Returns true if this is a shift immediate instruction."""
-    return inst in ["slli", "srli", "srai"]
-
-def is_core_inst(inst):
-    """Returns true if this instruction is in our list of core instructions."""
-    return inst in inst_to_types.keys()
-
-def parse_base_offset(operand_string):
-    """Takes in the base-offset address field from memory instructions
-        returns a tuple including the binary immediate and binary register.
-
-        Assumes the immediate is in decimal.
-
-        e.g. `lw t0, 4(t1)` will lead to this behavior:
-
-            `parse_base_offset("4(t1)") -> ("000000000100", "00110")` """
-    #remove the close paren
-    operand_string = operand_string.replace(")", "")
-    #split on the open to separate the parts
-    pieces = operand_string.split("(")
-    if(len(pieces) != 2):
-        raise BadImmediate("Parsing base-offset address, inappropriate number of elements: \n\t%s\n" % operand_string)
-
-    imm = dec_to_bin(pieces[0])
-    rs1 = get_register_bin(pieces[1])
-    return (imm, rs1)
-
-def verify_field_sizes(inst_list, inst_type, line_num):
-    """Takes in a list where each element is a binary string of one field 
-        of an instruction `inst_type` is the Type of the instruction, and 
-        `line_num` is the instruction index in the assembled program 
-        (`line_num` is only used for error output).
-
-        For example, you could call it this way:
-
-            verify_field_sizes((funct7, rs2, rs1, funct3, rd, opcode), Types.R, 23) 
-        
-        And it would check that all the various funct7, etc values are an
-        appropriate number of bits (well, actually characters since they're
-        strings of ones and zeroes).
-    """
-    raise NotImplementedError
-
-def reverse_string(s):
-    """A helper function to reverse strings using list slicing. 
-        Just syntactic sugar to help with readability."""
-    return s[::-1] 
-
-def is_int(s):
-    """Checks if a given string can be an integer or not."""
-    try:
-        int(s)
-    except ValueError:
-        return False
-    return True
-
-###### Functions to convert between different bases #####
-
-def dec_to_bin(decimal, size=12):
-    """Takes a decimal numer (as int or string) and returns the 
-        binary representation with number of bits equal to `size`. 
-        Uses the two's compliment representation for negative numbers."""
-    
-    if(type(decimal) == str):
-        try:
-            decimal = int(decimal)
-        except ValueError:
-            raise BadImmediate("Failed to parse value as an integer: %s" % (decimal))
-    
-    if(decimal >= 2**size):
-        raise BadImmediate("Not enough bits (%s) to represent the decimal number: %s" % (size, decimal))
-
-    binary_string = bin(((1 << size) - 1) & decimal)
-    binary_string = binary_string[2:]
-    return "0"*(size-len(binary_string)) + binary_string
-
-def join_inst_fields_bin(inst_list):
-    """Takes a list of binary strings and joins them together 
-        and grouping into 4 character slices."""
-    binary_string = "".join(inst_list)
-    binary_string = binary_string.replace(" ", "")
-    binary_string = "0"*(32-len(binary_string)) + binary_string
-    binary_string = " ".join(binary_string[i:i+4] for i in range(0, 32, 4))
-    return binary_string
-
-def bin_to_hex(bin_string):
-    """Takes a binary string and converts it into a hex string."""
-    #the [2:] here string off the leading '0x' of the hex string
-    if(bin_string == None):
-        return
-    #remove any whitespace in the string
-    bin_string = bin_string.replace(" ", "")
-    result = hex(int(bin_string, 2))[2:]
-    #add in any missing leading zeros
-    return "0"*(8-len(result)) + result
-
+    #one buffered write for the whole listing instead of a syscall per line
+    (out if out else sys.stdout).writelines(buf)
 
 ##############
 #
@@ -1095,11 +1150,11 @@ def parse_args():
         See the python docs for usage.
         """
     parser = argparse.ArgumentParser(description="A parser for 32-bit RISC-V assembly files.")
-    parser.add_argument("asm", type=argparse.FileType('r'), help="An asm file containing RISC-V code. \
+    parser.add_argument("asm", help="An asm file containing RISC-V code. \
                         Whitespace will be ignored. Text after a ; is treated as comments. \
                         Labels are identified by a trailing :, they can be on their own line or share a \
                         line with an instruction.")
-    parser.add_argument("--out", "-o", type=argparse.FileType('w'), help="The name of the output file that\
+    parser.add_argument("--out", "-o", help="The name of the output file that\
                          the assembled machine code will be written to.")
     parser.add_argument("--mode", "-m", choices=["bin","hex"], default="bin", help="The output mode for the\
                          machine file: binary or hexadecimal.")